@@ -3,15 +3,50 @@ AI Support Ticket System - Web Interface
 Flask web app to demonstrate the system in localhost browser
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import json
-from datetime import datetime
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+import importlib.util
+import orjson
+import os
+import sys
+import time
+from pathlib import Path
+from schemas import Ticket, format_day
+from templates import ResponseTemplates, estimate_tokens
 from ticket_ai import TicketAI
 
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# gzip/brotli for HTML and JSON responses over 500 bytes
+app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json']
+app.config['COMPRESS_LEVEL'] = 6
+app.config['COMPRESS_MIN_SIZE'] = 500
+Compress(app)
+
+# Templates only change on deploy: no mtime checks, keep every compiled template
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+app.jinja_env.cache = {}
+app.add_template_filter(format_day, 'day')
+
 ai = TicketAI()
 
+# Rendered dashboard, keyed on ticket store state
+_dash_cache = {'key': None, 'html': None}
+
 
 @app.route('/')
 def index():
@@ -19,24 +54,36 @@ def index():
     # Get system statistics
     tickets = ai.manager.tickets
     
+    # Serve cached render if tickets have not changed
+    key = (len(tickets), ai.manager.version)
+    if _dash_cache['key'] == key:
+        return _dash_cache['html']
+    
+    categories = {'code': 0, 'infra': 0, 'doc': 0, 'other': 0}
     stats = {
         'total': len(tickets),
-        'open': len([t for t in tickets.values() if t['stat'] == 'open']),
-        'in_progress': len([t for t in tickets.values() if t['stat'] == 'prog']),
-        'done': len([t for t in tickets.values() if t['stat'] == 'done']),
-        'high_priority': len([t for t in tickets.values() if t['pri'] == 1]),
-        'categories': {
-            'code': len([t for t in tickets.values() if t['cat'] == 'code']),
-            'infra': len([t for t in tickets.values() if t['cat'] == 'infra']),
-            'doc': len([t for t in tickets.values() if t['cat'] == 'doc']),
-            'other': len([t for t in tickets.values() if t['cat'] == 'other'])
-        }
+        'open': 0,
+        'in_progress': 0,
+        'done': 0,
+        'high_priority': 0,
+        'categories': categories
     }
     
+    # Single pass over tickets for all counters
+    for t in tickets.values():
+        s = t['stat']
+        stats['open' if s == 'open' else 'in_progress' if s == 'prog' else 'done'] += 1
+        if t['cat'] in categories:
+            categories[t['cat']] += 1
+        if t['pri'] == 1:
+            stats['high_priority'] += 1
+    
     # Get recent tickets (last 5)
-    recent_tickets = list(tickets.values())[-5:] if tickets else []
+    recent_tickets = list(ai.manager.recent)
     
-    return render_template('dashboard.html', stats=stats, recent_tickets=recent_tickets)
+    html = render_template('dashboard.html', stats=stats, recent_tickets=recent_tickets)
+    _dash_cache.update(key=key, html=html)
+    return html
 
 
 @app.route('/chat')
@@ -59,7 +106,7 @@ def api_process():
         return jsonify({
             'user_input': user_input,
             'ai_response': response,
-            'timestamp': datetime.now().strftime('%H:%M:%S')
+            'timestamp': time.strftime('%H:%M:%S')
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -75,7 +122,7 @@ def list_tickets():
 @app.route('/api/tickets')
 def api_tickets():
     """API to get tickets data"""
-    return jsonify(ai.manager.tickets)
+    return Response(ai.manager.tickets_json(), mimetype='application/json')
 
 
 @app.route('/demo')
@@ -92,34 +139,41 @@ def demo():
     return render_template('demo.html', examples=examples)
 
 
+# Token efficiency demo, built once from a fixed sample ticket so
+# viewing the page never writes to the ticket store
+_SAMPLE_TICKET = Ticket(id="T001", title="test ticket", desc="", cat="other",
+                        pri=2, stat="open", created=19737)  # 2024-01-15
+_SAMPLE_RESPONSES = [
+    ResponseTemplates.success_response("created", _SAMPLE_TICKET.to_dict()),
+    ResponseTemplates.list_response([_SAMPLE_TICKET.to_summary()])
+]
+
+
+def _analyze_tokens(response: dict) -> dict:
+    """Estimate token usage of a JSON response"""
+    json_str = orjson.dumps(response).decode()
+    return {
+        'response': response,
+        'json_str': json_str,
+        'estimated_tokens': estimate_tokens(json_str)
+    }
+
+
+_TOKEN_ANALYSIS = [_analyze_tokens(r) for r in _SAMPLE_RESPONSES]
+
+# Architecture doc only changes on deploy; read it once
+try:
+    _ARCHITECTURE_MD = Path(__file__).with_name('ARCHITECTURE.md').read_text()
+except FileNotFoundError:
+    _ARCHITECTURE_MD = "Architecture document not found"
+
+
 @app.route('/architecture')
 def architecture():
     """Show system architecture and token efficiency"""
-    try:
-        with open('ARCHITECTURE.md', 'r') as f:
-            architecture_content = f.read()
-    except FileNotFoundError:
-        architecture_content = "Architecture document not found"
-    
-    # Token efficiency demo
-    sample_responses = [
-        ai.process("Create test ticket"),
-        ai.process("Show all tickets")
-    ]
-    
-    token_analysis = []
-    for response in sample_responses:
-        json_str = json.dumps(response)
-        token_count = len(json_str.split()) + json_str.count(',') + json_str.count(':')
-        token_analysis.append({
-            'response': response,
-            'json_str': json_str,
-            'estimated_tokens': token_count
-        })
-    
     return render_template('architecture.html', 
-                         architecture=architecture_content,
-                         token_analysis=token_analysis)
+                         architecture=_ARCHITECTURE_MD,
+                         token_analysis=_TOKEN_ANALYSIS)
 
 
 if __name__ == '__main__':
@@ -140,6 +194,14 @@ if __name__ == '__main__':
     print("🚀 Starting server on http://localhost:8080")
     print("📝 Press Ctrl+C to stop the server")
     
+    # Hand over to gunicorn from this interpreter, resolving the app and config
+    # next to this file; fall back to the dev server where it is not installed
+    if importlib.util.find_spec('gunicorn'):
+        app_dir = Path(__file__).resolve().parent
+        os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '--chdir', str(app_dir),
+                                  '-c', str(app_dir / 'gunicorn.conf.py'), 'app:app'])
+    print("⚠️  gunicorn not found, using Flask development server")
+    
     try:
         app.run(debug=False, host='0.0.0.0', port=8080, threaded=True)
     except Exception as e:
@@ -3,7 +3,8 @@ AI Support Ticket System - Usage Examples
 Demonstrates minimal token usage patterns
 """
 
-import json
+import orjson
+from templates import estimate_tokens
 from ticket_ai import TicketAI
 
 
@@ -30,14 +31,14 @@ def main():
         print(f"User: {example}")
         
         response = ai.process(example)
-        print(f"AI: {json.dumps(response, indent=2)}")
+        print(f"AI: {orjson.dumps(response, option=orjson.OPT_INDENT_2).decode()}")
         print("-" * 50)
     
     print("\n=== System Statistics ===")
     
     # Show token efficiency
     sample_response = ai.process("Show open tickets")
-    token_count = len(json.dumps(sample_response).split())
+    token_count = estimate_tokens(orjson.dumps(sample_response))
     print(f"Avg response tokens: ~{token_count}")
     print(f"Total tickets in system: {len(ai.manager.tickets)}")
     
@@ -0,0 +1,19 @@
+"""
+AI Support Ticket System - Gunicorn Configuration
+Production WSGI settings for the web interface (gunicorn -c gunicorn.conf.py app:app)
+"""
+
+import multiprocessing
+import os
+
+
+bind = os.environ.get("BIND", "0.0.0.0:8080")
+
+# Tickets live in one in-process dict backed by a JSON file, so extra
+# workers would each hold a diverging copy. Scale with threads instead.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", multiprocessing.cpu_count() * 2))
+
+preload_app = True
+timeout = 30
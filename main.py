@@ -3,10 +3,36 @@ AI Support Ticket System - Main Interface
 Minimal CLI interface for testing and demonstration
 """
 
-import json
+import orjson
+from collections import Counter
 from ticket_ai import TicketAI
 
 
+QUIT_COMMANDS = frozenset({'quit', 'exit', 'q'})
+
+_STATS_TMPL = """
+📊 System Statistics:
+
+Total Tickets: {total}
+
+Status:
+  • Open: {s[open]}
+  • In Progress: {s[prog]} 
+  • Done: {s[done]}
+
+Categories:
+  • Code: {c[code]}
+  • Infrastructure: {c[infra]}
+  • Documentation: {c[doc]}
+  • Other: {c[other]}
+
+Priorities:
+  • High (1): {p[1]}
+  • Medium (2): {p[2]}
+  • Low (3): {p[3]}
+"""
+
+
 def main():
     """Interactive CLI for the AI support ticket system"""
     ai = TicketAI()
@@ -19,7 +45,7 @@ def main():
         try:
             user_input = input(">>> ").strip()
             
-            if user_input.lower() in ['quit', 'exit', 'q']:
+            if user_input.lower() in QUIT_COMMANDS:
                 print("Goodbye!")
                 break
             
@@ -36,7 +62,7 @@ def main():
             
             # Process with AI
             response = ai.process(user_input)
-            print(json.dumps(response, indent=2))
+            print(orjson.dumps(response, option=orjson.OPT_INDENT_2).decode())
             print()
             
         except KeyboardInterrupt:
@@ -88,37 +114,16 @@ def show_stats(ai: TicketAI):
         print("No tickets in system")
         return
     
-    # Count by status
-    status_counts = {"open": 0, "prog": 0, "done": 0}
-    category_counts = {"code": 0, "infra": 0, "doc": 0, "other": 0}
-    priority_counts = {1: 0, 2: 0, 3: 0}
+    # Count by status, category and priority in one pass
+    status_counts, category_counts, priority_counts = Counter(), Counter(), Counter()
     
     for ticket in tickets.values():
         status_counts[ticket["stat"]] += 1
-        category_counts[ticket["cat"]] += 1  
+        category_counts[ticket["cat"]] += 1
         priority_counts[ticket["pri"]] += 1
     
-    print(f"""
-📊 System Statistics:
-
-Total Tickets: {len(tickets)}
-
-Status:
-  • Open: {status_counts['open']}
-  • In Progress: {status_counts['prog']} 
-  • Done: {status_counts['done']}
-
-Categories:
-  • Code: {category_counts['code']}
-  • Infrastructure: {category_counts['infra']}
-  • Documentation: {category_counts['doc']}
-  • Other: {category_counts['other']}
-
-Priorities:
-  • High (1): {priority_counts[1]}
-  • Medium (2): {priority_counts[2]}
-  • Low (3): {priority_counts[3]}
-""")
+    print(_STATS_TMPL.format(total=len(tickets), s=status_counts,
+                             c=category_counts, p=priority_counts))
 
 
 if __name__ == "__main__":
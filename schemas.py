@@ -3,9 +3,10 @@ AI Support Ticket System - Core Data Schemas
 Token-efficient data structures for minimal usage
 """
 
+import re
 from dataclasses import dataclass
 from typing import Optional, Literal, Dict, List
-from datetime import datetime
+from datetime import date, timedelta
 
 
 # Type aliases for clarity
@@ -13,34 +14,51 @@ TicketId = str  # Format: T001-T999
 Category = Literal["code", "infra", "doc", "other"] 
 Priority = Literal[1, 2, 3]  # 1=high, 2=med, 3=low
 Status = Literal["open", "prog", "done"]
+EpochDay = int  # days since 1970-01-01
 
+EPOCH = date(1970, 1, 1)
 
-@dataclass
+
+def to_epoch_day(d: date) -> EpochDay:
+    """Convert a date to days since 1970-01-01"""
+    return (d - EPOCH).days
+
+
+def format_day(day: EpochDay) -> str:
+    """Format an epoch day as YYYY-MM-DD for display"""
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+@dataclass(slots=True, frozen=True)
 class Ticket:
-    """Minimal ticket schema - optimized for token efficiency"""
+    """Minimal ticket schema - optimized for token efficiency
+    
+    Typed view for in-process handoff; TicketManager stores plain dicts.
+    """
     id: TicketId
     title: str  # max 50 chars
     desc: str   # max 200 chars
     cat: Category
     pri: Priority 
     stat: Status
-    created: str  # YYYY-MM-DD format
+    created: EpochDay  # days since 1970-01-01
     res: Optional[str] = None  # max 100 chars
     
+    def __post_init__(self):
+        """Truncate text fields once so serialization is a plain read"""
+        object.__setattr__(self, "title", self.title[:50])
+        object.__setattr__(self, "desc", self.desc[:200])
+        if self.res:
+            object.__setattr__(self, "res", self.res[:100])
+    
     def to_dict(self) -> Dict:
         """Convert to compressed dict format"""
-        data = {
-            "id": self.id,
-            "title": self.title[:50],
-            "desc": self.desc[:200], 
-            "cat": self.cat,
-            "pri": self.pri,
-            "stat": self.stat,
-            "created": self.created
-        }
+        # One fixed-shape literal per case: no key insertion after build
         if self.res:
-            data["res"] = self.res[:100]
-        return data
+            return {"id": self.id, "title": self.title, "desc": self.desc, "cat": self.cat,
+                    "pri": self.pri, "stat": self.stat, "created": self.created, "res": self.res}
+        return {"id": self.id, "title": self.title, "desc": self.desc, "cat": self.cat,
+                "pri": self.pri, "stat": self.stat, "created": self.created}
     
     def to_summary(self) -> Dict:
         """Ultra-compact format for listings"""
@@ -83,15 +101,47 @@ class ApiResponse:
 
 # Category keywords for auto-classification
 CATEGORY_KEYWORDS = {
-    "code": ["bug", "error", "exception", "build", "compile", "deploy", "ci/cd"],
-    "infra": ["server", "network", "database", "performance", "outage", "aws", "azure"],
-    "doc": ["documentation", "readme", "guide", "manual", "wiki", "spec"],
-    "other": ["meeting", "training", "access", "account", "general"]
+    "code": frozenset({"bug", "error", "exception", "build", "compile", "deploy", "ci/cd"}),
+    "infra": frozenset({"server", "network", "database", "performance", "outage", "aws", "azure"}),
+    "doc": frozenset({"documentation", "readme", "guide", "manual", "wiki", "spec"}),
+    "other": frozenset({"meeting", "training", "access", "account", "general"})
 }
 
 # Priority keywords for auto-classification  
 PRIORITY_KEYWORDS = {
-    1: ["urgent", "critical", "asap", "emergency", "outage", "down", "high"],
-    2: ["medium", "normal", "standard", "med"],
-    3: ["low", "minor", "enhancement", "nice-to-have"]
+    1: frozenset({"urgent", "critical", "asap", "emergency", "outage", "down", "high"}),
+    2: frozenset({"medium", "normal", "standard", "med"}),
+    3: frozenset({"low", "minor", "enhancement", "nice-to-have"})
 }
+
+# Status keywords for update/view parsing; "new" is a separate entry because
+# it only means open in updates - in views it is mostly free text ("the new API")
+STATUS_KEYWORDS = {
+    "prog": frozenset({"prog", "working"}),
+    "done": frozenset({"done", "completed", "finished", "closed"}),
+    "open": frozenset({"open"}),
+    "new": frozenset({"new"})
+}
+
+
+def _keyword_hits() -> Dict[str, tuple]:
+    """Map each keyword to its ("cat"|"pri"|"stat", value) labels"""
+    hits = {}
+    for kind, table in (("cat", CATEGORY_KEYWORDS), ("pri", PRIORITY_KEYWORDS), ("stat", STATUS_KEYWORDS)):
+        for value, kws in table.items():
+            for kw in kws:
+                hits.setdefault(kw, []).append((kind, value))
+    return {kw: tuple(labels) for kw, labels in hits.items()}
+
+
+def _keyword_regex(words) -> re.Pattern:
+    """Compile keywords into one alternation (match against lowercased text)"""
+    # Longest first so e.g. "medium" wins over "med" at the same position
+    ordered = sorted(words, key=lambda kw: (-len(kw), kw))
+    return re.compile("|".join(re.escape(kw) for kw in ordered))
+
+
+# Single-pass keyword matcher over all tables: regex hit -> labels
+KEYWORD_HITS = _keyword_hits()
+KEYWORD_RE = _keyword_regex(KEYWORD_HITS)
+CATEGORY_RANK = {cat: rank for rank, cat in enumerate(CATEGORY_KEYWORDS)}
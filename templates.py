@@ -3,6 +3,7 @@ AI Support Ticket System - Response Templates
 Pre-computed templates to minimize token usage
 """
 
+from types import MappingProxyType
 from typing import Dict
 
 
@@ -41,8 +42,8 @@ class ResponseTemplates:
         }
     }
     
-    # Error messages (ultra-short)
-    ERRORS = {
+    # Error messages (ultra-short, read-only)
+    ERRORS = MappingProxyType({
         "missing_title": "title required",
         "invalid_id": "invalid ticket id", 
         "invalid_priority": "priority must be 1-3",
@@ -50,14 +51,17 @@ class ResponseTemplates:
         "invalid_status": "invalid status",
         "ticket_exists": "ticket id exists",
         "storage_error": "storage failed"
-    }
+    })
     
     @staticmethod
     def success_response(action: str, data: Dict) -> Dict:
         """Generate success response with minimal tokens"""
-        template = ResponseTemplates.ACTIONS.get(action, ResponseTemplates.ACTIONS["created"])
-        template["data"] = data
-        return template.copy()
+        # Build a fresh dict; never mutate the shared ACTIONS templates
+        if action == "retrieved":
+            return ResponseTemplates.list_response(data)
+        if action not in ResponseTemplates.ACTIONS:
+            action = "created"
+        return {"status": "ok", "action": action, "data": data}
     
     @staticmethod 
     def error_response(error_key: str) -> Dict:
@@ -77,8 +81,20 @@ class ResponseTemplates:
         }
 
 
-# Pre-computed help responses
-HELP_RESPONSES = {
+def estimate_tokens(payload: str | bytes) -> int:
+    """Approximate token count of a JSON payload (~4 chars per token)"""
+    return len(payload) // 4
+
+
+def _freeze(value):
+    """Wrap nested dicts in read-only proxies (MappingProxyType is shallow)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+# Pre-computed help responses (read-only at every level)
+HELP_RESPONSES = _freeze({
     "commands": {
         "status": "ok",
         "data": {
@@ -98,11 +114,11 @@ HELP_RESPONSES = {
             "other": "general requests"
         }
     }
-}
+})
 
 
-# Status code mappings for ultra-short responses
-STATUS_CODES = {
+# Status code mappings for ultra-short responses (read-only)
+STATUS_CODES = MappingProxyType({
     "success": "ok",
     "created": "ok", 
     "updated": "up",
@@ -110,4 +126,4 @@ STATUS_CODES = {
     "not_found": "nf", 
     "error": "er",
     "invalid": "er"
-}
+})
@@ -5,25 +5,23 @@ Validate core functionality and token efficiency
 
 import unittest
 import json
+import orjson
 import tempfile
+import threading
+from datetime import date
 from pathlib import Path
 
 from ticket_ai import TicketAI, TicketManager
-from schemas import TicketQuery
+from schemas import Ticket, TicketQuery, format_day
+from templates import ResponseTemplates, HELP_RESPONSES, estimate_tokens
 
 
 class TestTicketManager(unittest.TestCase):
     """Test core ticket management functions"""
     
     def setUp(self):
-        """Set up test environment with temporary data file"""
-        self.temp_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
-        self.temp_file.close()
-        self.manager = TicketManager(self.temp_file.name)
-    
-    def tearDown(self):
-        """Clean up temporary files"""
-        Path(self.temp_file.name).unlink(missing_ok=True)
+        """Set up test environment with in-memory storage"""
+        self.manager = TicketManager(None)
     
     def test_create_ticket(self):
         """Test ticket creation"""
@@ -76,21 +74,217 @@ class TestTicketManager(unittest.TestCase):
         self.assertEqual(response["status"], "ok")
         self.assertEqual(response["count"], 1)
         self.assertEqual(response["data"][0]["cat"], "code")
+    
+    def test_list_tickets_after_status_change(self):
+        """Test filtered listings follow status changes"""
+        first = self.manager.create_ticket("Bug 1", cat="code", pri=1)["data"]["id"]
+        self.manager.create_ticket("Bug 2", cat="code", pri=1)
+        self.manager.close_ticket(first, "Fixed")
+        
+        open_ids = [t["id"] for t in self.manager.list_tickets(TicketQuery(status="open", priority=1))["data"]]
+        done_ids = [t["id"] for t in self.manager.list_tickets(TicketQuery(status="done"))["data"]]
+        
+        self.assertEqual(open_ids, ["T002"])
+        self.assertEqual(done_ids, [first])
+    
+    def test_list_tickets_limit(self):
+        """Test listing stops at the query limit"""
+        for i in range(5):
+            self.manager.create_ticket(f"Bug {i}")
+        
+        response = self.manager.list_tickets(TicketQuery(limit=3))
+        
+        self.assertEqual(response["count"], 3)
+        self.assertEqual([t["id"] for t in response["data"]], ["T001", "T002", "T003"])
+    
+    def test_responses_do_not_share_state(self):
+        """Test success responses are independent dicts"""
+        first = self.manager.create_ticket("First ticket")
+        second = self.manager.create_ticket("Second ticket")
+        
+        self.assertEqual(first["data"]["title"], "First ticket")
+        self.assertEqual(second["data"]["title"], "Second ticket")
+        self.assertEqual(ResponseTemplates.ACTIONS["created"]["data"], {})
+    
+    def test_help_responses_read_only(self):
+        """Test nested help responses cannot be modified"""
+        with self.assertRaises(TypeError):
+            HELP_RESPONSES["commands"]["data"]["create"] = "changed"
+    
+    def test_recent_tickets(self):
+        """Test recent tickets keep the last 5 created"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            for i in range(7):
+                manager.create_ticket(f"Ticket {i}")
+            
+            titles = [t["title"] for t in manager.recent]
+            self.assertEqual(titles, [f"Ticket {i}" for i in range(2, 7)])
+            
+            # Reloading from disk rebuilds the same window
+            reloaded = TicketManager(data_file)
+            self.assertEqual([t["title"] for t in reloaded.recent], titles)
+    
+    def test_batch_defers_saves(self):
+        """Test batch() writes to disk once on exit"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = Path(tmp) / "tickets.json"
+            manager = TicketManager(str(data_file))
+            
+            with manager.batch():
+                manager.create_ticket("Bug 1")
+                manager.create_ticket("Bug 2")
+                self.assertFalse(manager.log_file.exists())
+            
+            self.assertEqual(len(manager.log_file.read_bytes().splitlines()), 2)
+            self.assertEqual(len(TicketManager(str(data_file)).tickets), 2)
+    
+    def test_lazy_load(self):
+        """Test tickets are read from disk on first access, not on construction"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = Path(tmp) / "tickets.json"
+            TicketManager(str(data_file)).create_ticket("Bug 1")
+            
+            manager = TicketManager(str(data_file))
+            self.assertIsNone(manager._tickets)
+            self.assertEqual(manager.create_ticket("Bug 2")["data"]["id"], "T002")
+            self.assertEqual(len(manager.tickets), 2)
+    
+    def test_change_log_replay_and_compact(self):
+        """Test the change log replays on load and compacts into the snapshot"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            ticket_id = manager.create_ticket("Bug 1")["data"]["id"]
+            manager.close_ticket(ticket_id, "Fixed")
+            
+            self.assertEqual(TicketManager(data_file).tickets, manager.tickets)
+            
+            manager.compact()
+            
+            self.assertEqual(manager.log_file.read_bytes(), b"")
+            self.assertEqual(TicketManager(data_file).tickets[ticket_id]["stat"], "done")
+    
+    def test_torn_log_tail(self):
+        """Test a torn log tail does not swallow later writes"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            manager.create_ticket("Bug 1")
+            with open(manager.log_file, "ab") as f:
+                f.write(b'{"op":"upsert","id":"T00')
+            
+            manager = TicketManager(data_file)
+            self.assertEqual(manager.create_ticket("Bug 2")["data"]["id"], "T002")
+            
+            reloaded = TicketManager(data_file)
+            self.assertEqual(reloaded.tickets["T002"]["title"], "Bug 2")
+            self.assertEqual(reloaded.create_ticket("Bug 3")["data"]["id"], "T003")
+    
+    def test_concurrent_creates(self):
+        """Test creates from several threads get unique IDs and all persist"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            
+            def worker():
+                for _ in range(50):
+                    manager.create_ticket("Bug")
+            
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            self.assertEqual(len(manager.tickets), 200)
+            self.assertEqual(TicketManager(data_file).tickets, manager.tickets)
+    
+    def test_concurrent_reads_during_writes(self):
+        """Test JSON reads racing creates never leave a stale snapshot"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            done = threading.Event()
+            
+            def reader():
+                while not done.is_set():
+                    manager.tickets_json()
+            
+            thread = threading.Thread(target=reader)
+            thread.start()
+            for i in range(200):
+                manager.create_ticket(f"Bug {i}")
+            done.set()
+            thread.join()
+            
+            self.assertEqual(json.loads(manager.tickets_json()), manager.tickets)
+            manager.compact()
+            self.assertEqual(len(TicketManager(data_file).tickets), 200)
+    
+    def test_malformed_log_records_skipped(self):
+        """Test valid-JSON log lines missing fields are skipped on load"""
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = str(Path(tmp) / "tickets.json")
+            manager = TicketManager(data_file)
+            manager.create_ticket("Bug 1")
+            with open(manager.log_file, "ab") as f:
+                f.write(b'{"op":"upsert","id":"T002"}\n[1, 2]\n{"op":"delete","id":"T001"}\n')
+            
+            reloaded = TicketManager(data_file)
+            self.assertEqual(list(reloaded.tickets), ["T001"])
+            self.assertEqual(reloaded.create_ticket("Bug 2")["data"]["id"], "T002")
+    
+    def test_created_epoch_days(self):
+        """Test created dates are stored as epoch days and legacy dates migrate"""
+        ticket = self.manager.create_ticket("Test ticket")["data"]
+        self.assertEqual(format_day(ticket["created"]), date.today().isoformat())
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = Path(tmp) / "tickets.json"
+            data_file.write_text(json.dumps({"T001": {"id": "T001", "title": "Old", "desc": "", "cat": "doc",
+                                                      "pri": 2, "stat": "open", "created": "2024-01-15"}}))
+            
+            self.assertEqual(TicketManager(str(data_file)).tickets["T001"]["created"], 19737)
+    
+    def test_stored_shape_matches_schema(self):
+        """Test created tickets are stored in Ticket.to_dict() shape"""
+        data = self.manager.create_ticket("x" * 60, "Desc", "code", 1)["data"]
+        
+        self.assertEqual(data, Ticket(**data).to_dict())
+        self.assertEqual(len(data["title"]), 50)
+    
+    def test_version_bumps_on_change(self):
+        """Test mutations bump the cache version"""
+        start = self.manager.version
+        ticket_id = self.manager.create_ticket("Test ticket")["data"]["id"]
+        self.manager.close_ticket(ticket_id, "Done")
+        
+        self.assertEqual(self.manager.version, start + 2)
+        
+        # Failed updates leave the version alone
+        self.manager.update_ticket("T999", "prog")
+        self.assertEqual(self.manager.version, start + 2)
+    
+    def test_tickets_json_cache(self):
+        """Test cached JSON payload tracks ticket changes"""
+        ticket_id = self.manager.create_ticket("Test ticket")["data"]["id"]
+        payload = self.manager.tickets_json()
+        
+        self.assertIs(self.manager.tickets_json(), payload)
+        self.assertEqual(json.loads(payload), self.manager.tickets)
+        
+        self.manager.close_ticket(ticket_id, "Fixed")
+        self.assertEqual(json.loads(self.manager.tickets_json())[ticket_id]["stat"], "done")
 
 
 class TestTicketAI(unittest.TestCase):
     """Test AI natural language processing"""
     
     def setUp(self):
-        """Set up AI instance with temporary storage"""
-        self.temp_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
-        self.temp_file.close()
-        self.ai = TicketAI()
-        self.ai.manager = TicketManager(self.temp_file.name)
-    
-    def tearDown(self):
-        """Clean up"""
-        Path(self.temp_file.name).unlink(missing_ok=True)
+        """Set up AI instance with in-memory storage"""
+        self.ai = TicketAI(TicketManager(None))
     
     def test_create_parsing(self):
         """Test natural language ticket creation"""
@@ -127,6 +321,18 @@ class TestTicketAI(unittest.TestCase):
         self.assertEqual(response["status"], "ok")
         self.assertGreaterEqual(response["count"], 2)
     
+    def test_view_priority_filter(self):
+        """Test a medium keyword does not cancel a low priority filter"""
+        self.assertEqual(self.ai._parse_input("Show low priority tickets that timed out"), ("list", (None, 3)))
+        self.assertEqual(self.ai._parse_input("List minor tickets for renamed endpoints"), ("list", (None, 3)))
+        self.assertEqual(self.ai._parse_input("Show urgent low tickets"), ("list", (None, 1)))
+    
+    def test_view_ignores_new(self):
+        """Test "new" in a view is free text, not an open-status filter"""
+        self.assertEqual(self.ai._parse_input("Show tickets about the new API"), ("list", (None, None)))
+        self.assertEqual(self.ai._parse_input("Show open tickets"), ("list", ("open", None)))
+        self.assertEqual(self.ai._parse_input("Update T001 new info")[1][1], "open")
+    
     def test_close_parsing(self):
         """Test ticket closure parsing"""
         # Create and close ticket
@@ -139,22 +345,61 @@ class TestTicketAI(unittest.TestCase):
         self.assertEqual(response["action"], "closed")
         self.assertEqual(response["data"]["stat"], "done")
         self.assertIn("fixed the problem", response["data"]["res"])
+    
+    def test_leftmost_action_wins(self):
+        """Test the first action keyword in the text decides the action"""
+        create_response = self.ai.process("Create test ticket")
+        ticket_id = create_response["data"]["id"]
+        
+        # "updated" appears later and must not turn this into an update
+        response = self.ai.process(f"Resolve {ticket_id}, updated documentation")
+        
+        self.assertEqual(response["action"], "closed")
+        self.assertEqual(response["data"]["res"], "updated documentation")
+    
+    def test_parse_cache(self):
+        """Test repeated inputs reuse the parse but still execute"""
+        self.ai.process("Create ticket for login bug")
+        self.ai.process("Create  ticket for login bug ")
+        
+        self.assertEqual(self.ai._parse.cache_info().hits, 1)
+        self.assertEqual(len(self.ai.manager.tickets), 2)
+    
+    def test_keyword_classification(self):
+        """Test keyword precedence in auto-classification"""
+        self.assertEqual(self.ai._extract_priority("low priority but URGENT"), 1)
+        self.assertEqual(self.ai._extract_priority("minor typo"), 3)
+        self.assertEqual(self.ai._extract_category("server error"), "code")
+        self.assertEqual(self.ai._extract_category("hello"), "other")
+    
+    def test_process_batch(self):
+        """Test batch processing returns one response per input"""
+        responses = self.ai.process_batch(["Create ticket for login bug", "close T001, fixed", "hello"])
+        
+        self.assertEqual([r["status"] for r in responses], ["ok", "ok", "er"])
+        self.assertEqual(self.ai.manager.tickets["T001"]["stat"], "done")
+    
+    def test_keyword_scan(self):
+        """Test one scan collects category, priority and status hits"""
+        hits = self.ai._scan_keywords("urgent: server down, working on it")
+        
+        self.assertEqual(hits["cat"], {"infra"})
+        self.assertEqual(hits["pri"], {1})
+        self.assertEqual(hits["stat"], {"prog"})
+        self.assertEqual(self.ai._extract_status(hits, ("open", "prog", "done")), "prog")
 
 
 class TestTokenEfficiency(unittest.TestCase):
     """Test token usage optimization"""
     
     def setUp(self):
-        self.ai = TicketAI()
+        self.ai = TicketAI(TicketManager(None))
     
     def test_response_size(self):
         """Verify responses stay under token limits"""
         # Create sample response
         response = self.ai.process("Create test ticket")
-        json_str = json.dumps(response)
-        
-        # Count approximate tokens (words + punctuation)
-        token_count = len(json_str.split()) + json_str.count(',') + json_str.count(':')
+        token_count = estimate_tokens(orjson.dumps(response))
         
         # Should be under 50 tokens for typical response
         self.assertLess(token_count, 50)
@@ -172,6 +417,7 @@ class TestTokenEfficiency(unittest.TestCase):
     
     def test_enum_values(self):
         """Verify short enum values"""
+        self.ai.process("Create test ticket")
         response = self.ai.process("Update T001 to in progress")
         
         # Status should be abbreviated
@@ -3,51 +3,210 @@ AI Support Ticket System - Core Logic
 Minimal, token-efficient ticket management
 """
 
-import json
+import heapq
+import operator
 import re
-from datetime import datetime
+import threading
+import orjson
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import date
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
-from schemas import Ticket, TicketQuery, ApiResponse, CATEGORY_KEYWORDS, PRIORITY_KEYWORDS
+from schemas import (TicketQuery, ApiResponse, CATEGORY_RANK, KEYWORD_HITS, KEYWORD_RE,
+                     to_epoch_day)
 from templates import ResponseTemplates
 
 
+# Ticket fields with secondary indexes for filtered listings
+INDEXED_FIELDS = ("stat", "cat", "pri")
+
+# Listing summary fields, fetched in one C-level call per ticket
+_summary_fields = operator.itemgetter("id", "title", "cat", "pri")
+
+# Compact the change log once it outgrows the snapshot by this factor
+COMPACT_RATIO = 4
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+def _id_number(ticket_id: str) -> int:
+    """Numeric part of a ticket ID (T012 -> 12)"""
+    return int(ticket_id[1:])
+
+
+def _valid_record(record) -> bool:
+    """Check a change log line is a well-formed upsert"""
+    if not isinstance(record, dict) or record.get("op") != "upsert":
+        return False
+    ticket_id, ticket = record.get("id"), record.get("t")
+    return (isinstance(ticket_id, str) and ticket_id[1:].isdigit()
+            and isinstance(ticket, dict) and ticket.get("id") == ticket_id)
+
+
 class TicketManager:
-    """Core ticket management with JSON storage"""
+    """Core ticket management with JSON snapshot + append-only change log"""
     
-    def __init__(self, data_file: str = "data/tickets.json"):
-        self.data_file = Path(data_file)
-        self.data_file.parent.mkdir(exist_ok=True)
-        self._load_data()
+    def __init__(self, data_file: Optional[str] = "data/tickets.json"):
+        # data_file=None keeps tickets in memory only (no disk I/O)
+        self.data_file = Path(data_file) if data_file else None
+        self.log_file = self.data_file.with_suffix(".jsonl") if self.data_file else None
+        if self.data_file:
+            self.data_file.parent.mkdir(exist_ok=True)
+        self.version = 0  # bumped on every mutation for cache invalidation
+        self._json_cache = None
+        self._batch_depth = 0  # > 0 inside batch(); saves are deferred
+        self._pending = {}  # ticket IDs changed since the last save (ordered)
+        self._tickets = None  # loaded from disk on first access
+        # Serialises load, mutate, log append and compaction across server threads
+        # (re-entrant: mutations save, and saves may compact, under the same lock)
+        self._lock = threading.RLock()
+    
+    def _ensure_loaded(self):
+        """Load from disk once, even if several threads ask at the same time"""
+        if self._tickets is None:
+            with self._lock:
+                if self._tickets is None:
+                    self._load_data()
+    
+    @property
+    def tickets(self) -> Dict[str, Dict]:
+        """All tickets by ID, loaded on first access"""
+        self._ensure_loaded()
+        return self._tickets
+    
+    @property
+    def recent(self) -> deque:
+        """Last 5 created tickets, oldest first"""
+        self._ensure_loaded()
+        return self._recent
     
     def _load_data(self):
-        """Load tickets from JSON file"""
-        if self.data_file.exists():
+        """Load tickets from the JSON snapshot, then replay the change log"""
+        tickets = {}
+        self._snapshot_size = self._log_size = 0
+        
+        if self.data_file and self.data_file.exists():
             try:
-                with open(self.data_file, 'r') as f:
-                    content = f.read().strip()
-                    if content:
-                        self.tickets = json.loads(content)
-                    else:
-                        self.tickets = {}
-            except (json.JSONDecodeError, FileNotFoundError):
-                self.tickets = {}
-        else:
-            self.tickets = {}
+                content = self.data_file.read_bytes()
+                self._snapshot_size = len(content)
+                content = content.strip()
+                tickets = orjson.loads(content) if content else {}
+            except (orjson.JSONDecodeError, FileNotFoundError):
+                tickets = {}
+        
+        if self.log_file and self.log_file.exists():
+            content = self.log_file.read_bytes()
+            if content and not content.endswith(b"\n"):
+                # Drop a torn tail from an interrupted write so later appends
+                # start on a fresh line instead of joining the fragment
+                content = content[:content.rfind(b"\n") + 1]
+                with open(self.log_file, 'r+b') as f:
+                    f.truncate(len(content))
+            self._log_size = len(content)
+            for line in content.splitlines():
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # blank or corrupt line
+                if _valid_record(record):
+                    tickets[record["id"]] = record["t"]
+        
+        # Migrate legacy YYYY-MM-DD created dates to epoch days
+        for ticket in tickets.values():
+            if isinstance(ticket.get("created"), str):
+                ticket["created"] = to_epoch_day(date.fromisoformat(ticket["created"]))
+        
+        # Last 5 created tickets, oldest first
+        self._recent = deque(tickets.values(), maxlen=5)
+        
+        # Highest numeric ID so far; new IDs count up from here
+        self._max_id = max((_id_number(tid) for tid in tickets), default=0)
+        
+        # Secondary indexes: field -> value -> ticket IDs
+        self._indexes = {field: defaultdict(set) for field in INDEXED_FIELDS}
+        for ticket in tickets.values():
+            self._index_add(ticket)
+        
+        self._tickets = tickets
+    
+    def _index_add(self, ticket: Dict):
+        """Add a ticket to the secondary indexes"""
+        for field, index in self._indexes.items():
+            index[ticket.get(field)].add(ticket["id"])
     
     def _save_data(self):
-        """Save tickets to JSON file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.tickets, f, indent=2)
+        """Append pending ticket changes to the log, compacting when it grows"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self.data_file is None or not pending:
+                return
+            
+            # One upsert line per changed ticket, written in a single append
+            lines = b"".join(orjson.dumps({"op": "upsert", "id": tid, "t": self.tickets[tid]}) + b"\n"
+                             for tid in pending)
+            with open(self.log_file, 'ab') as f:
+                f.write(lines)
+            self._log_size += len(lines)
+            
+            if self._log_size > max(COMPACT_RATIO * self._snapshot_size, COMPACT_MIN_BYTES):
+                self.compact()
+    
+    def compact(self):
+        """Rewrite the snapshot from memory and truncate the change log"""
+        if self.data_file is None:
+            return
+        
+        # Held throughout so no change lands between the snapshot and the truncate
+        with self._lock:
+            # Replace the snapshot atomically; replaying a stale log over it is harmless
+            payload = self.tickets_json()
+            tmp_file = self.data_file.with_suffix(".tmp")
+            tmp_file.write_bytes(payload)
+            tmp_file.replace(self.data_file)
+            self.log_file.write_bytes(b"")
+            self._snapshot_size, self._log_size = len(payload), 0
+    
+    def _mark_dirty(self, ticket_id: str):
+        """Persist now, or once at the end of the enclosing batch()"""
+        self._pending[ticket_id] = None
+        if not self._batch_depth:
+            self._save_data()
+    
+    @contextmanager
+    def batch(self):
+        """Group mutations so they are written to disk once on exit"""
+        # Other threads wait for the batch, so their changes are never deferred into it
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._pending:
+                    self._save_data()
+    
+    def _touch(self):
+        """Mark ticket data as changed"""
+        self.version += 1
+        self._json_cache = None
+    
+    def _apply(self, ticket_id: str, **fields):
+        """Write fields to a ticket in one update and persist once"""
+        with self._lock:
+            ticket = self.tickets[ticket_id]
+            for field in fields.keys() & self._indexes.keys():
+                self._indexes[field][ticket.get(field)].discard(ticket_id)
+                self._indexes[field][fields[field]].add(ticket_id)
+            ticket.update(fields)
+            self._touch()
+            self._mark_dirty(ticket_id)
     
     def _generate_id(self) -> str:
         """Generate next ticket ID (T001-T999)"""
-        if not self.tickets:
-            return "T001"
-        
-        max_num = max([int(tid[1:]) for tid in self.tickets.keys()])
-        return f"T{max_num + 1:03d}"
+        self._max_id += 1
+        return f"T{self._max_id:03d}"
     
     def create_ticket(self, title: str, desc: str = "", 
                      cat: str = "other", pri: int = 2) -> Dict:
@@ -55,21 +214,19 @@ class TicketManager:
         if not title:
             return ResponseTemplates.error_response("missing_title")
         
-        ticket_id = self._generate_id()
-        ticket = Ticket(
-            id=ticket_id,
-            title=title[:50],
-            desc=desc[:200],
-            cat=cat,
-            pri=pri,
-            stat="open", 
-            created=datetime.now().strftime("%Y-%m-%d")
-        )
+        with self._lock:
+            tickets = self.tickets  # load first: ID generation needs the highest ID
+            ticket_id = self._generate_id()
+            # Storage dict built directly in Ticket.to_dict() shape
+            data = {"id": ticket_id, "title": title[:50], "desc": desc[:200], "cat": cat,
+                    "pri": pri, "stat": "open", "created": to_epoch_day(date.today())}
+            tickets[ticket_id] = data
+            self._recent.append(data)
+            self._index_add(data)
+            self._touch()
+            self._mark_dirty(ticket_id)
         
-        self.tickets[ticket_id] = ticket.to_dict()
-        self._save_data()
-        
-        return ResponseTemplates.success_response("created", ticket.to_dict())
+        return ResponseTemplates.success_response("created", data)
     
     def update_ticket(self, ticket_id: str, status: str = None, 
                      resolution: str = None) -> Dict:
@@ -77,18 +234,15 @@ class TicketManager:
         if ticket_id not in self.tickets:
             return ResponseTemplates.error_response("invalid_id")
         
-        ticket = self.tickets[ticket_id]
         updated_fields = {}
         
         if status:
-            ticket["stat"] = status
             updated_fields["stat"] = status
             
         if resolution:
-            ticket["res"] = resolution[:100]
             updated_fields["res"] = resolution[:100]
         
-        self._save_data()
+        self._apply(ticket_id, **updated_fields)
         
         response_data = {"id": ticket_id, **updated_fields}
         return ResponseTemplates.success_response("updated", response_data)
@@ -102,45 +256,63 @@ class TicketManager:
     
     def list_tickets(self, query: TicketQuery = None) -> Dict:
         """List tickets with optional filtering"""
+        tickets = self.tickets  # load before reading the indexes
         results = []
+        if query:
+            status, category, priority, limit = query.status, query.category, query.priority, query.limit
+        else:
+            status = category = priority = limit = None
+        filters = [(field, value) for field, value in
+                   (("stat", status), ("cat", category), ("pri", priority)) if value]
         
-        for ticket in self.tickets.values():
-            # Apply filters
-            if query:
-                if query.status and ticket["stat"] != query.status:
-                    continue
-                if query.category and ticket["cat"] != query.category:
-                    continue  
-                if query.priority and ticket["pri"] != query.priority:
-                    continue
-            
-            # Use summary format for listings
-            results.append({
-                "id": ticket["id"],
-                "title": ticket["title"][:30],
-                "cat": ticket["cat"], 
-                "pri": ticket["pri"]
-            })
+        if filters:
+            # Intersect index sets, then restore creation order (IDs count up)
+            ids = set.intersection(*(self._indexes[field].get(value, set())
+                                     for field, value in filters))
+            if limit:
+                ids = heapq.nsmallest(limit, ids, key=_id_number)
+            else:
+                ids = sorted(ids, key=_id_number)
+            candidates = (tickets[tid] for tid in ids)
+        else:
+            candidates = tickets.values()
         
-        # Apply limit
-        if query and query.limit:
-            results = results[:query.limit]
+        append = results.append
+        for ticket in candidates:
+            # Use summary format for listings
+            ticket_id, title, cat, pri = _summary_fields(ticket)
+            append({"id": ticket_id, "title": title[:30], "cat": cat, "pri": pri})
+            
+            # Stop as soon as the limit is reached
+            if limit and len(results) >= limit:
+                break
         
         return ResponseTemplates.list_response(results, len(results))
     
+    def tickets_json(self) -> bytes:
+        """All tickets as JSON bytes, serialized once per change"""
+        payload = self._json_cache
+        if payload is None:
+            # Serialize under the lock so a concurrent change cannot slip in
+            # between the dump and the cache store (compact() writes this to disk)
+            with self._lock:
+                if self._json_cache is None:
+                    self._json_cache = orjson.dumps(self.tickets)
+                payload = self._json_cache
+        return payload
+    
     def close_ticket(self, ticket_id: str, resolution: str) -> Dict:
         """Close ticket with resolution"""
         if ticket_id not in self.tickets:
             return ResponseTemplates.error_response("invalid_id")
         
-        self.tickets[ticket_id]["stat"] = "done"
-        self.tickets[ticket_id]["res"] = resolution[:100]
-        self._save_data()
+        res = resolution[:100]
+        self._apply(ticket_id, stat="done", res=res)
         
         response_data = {
             "id": ticket_id,
             "stat": "done", 
-            "res": resolution[:100]
+            "res": res
         }
         return ResponseTemplates.success_response("closed", response_data)
 
@@ -148,139 +320,173 @@ class TicketManager:
 class TicketAI:
     """AI interface for natural language ticket operations"""
     
-    def __init__(self):
-        self.manager = TicketManager()
+    def __init__(self, manager: Optional[TicketManager] = None):
+        self.manager = manager if manager is not None else TicketManager()
         self.action_patterns = {
             r'create|new|add': 'create',
             r'update|modify|change': 'update', 
             r'show|view|get|list|find': 'view',
             r'close|resolve|finish|done': 'close'
         }
+        
+        # Pre-compiled patterns, reused on every call
+        # One alternation with a named group per action; leftmost keyword wins
+        self._action_re = re.compile(
+            "|".join(f"(?P<{action}>{pattern})" for pattern, action in self.action_patterns.items()),
+            re.IGNORECASE)
+        self._id_re = re.compile(r'T\d{3}', re.IGNORECASE)
+        self._create_title_re = re.compile(r'(?:create|new|add)\s+(?:ticket\s+)?(.+)', re.IGNORECASE)
+        self._update_note_re = re.compile(r'\s+.*?\s+(.+)')  # matched right after the ticket ID
+        self._close_res_re = re.compile(r'[,\s]+(.+)')  # matched right after the ticket ID
+        
+        # Parsing is a pure function of the text; memoise repeated inputs
+        self._parse = lru_cache(maxsize=512)(self._parse_input)
+    
+    def _scan_keywords(self, text_lower: str) -> Dict[str, set]:
+        """Collect category/priority/status hits from lowercased text in one scan"""
+        hits = {"cat": set(), "pri": set(), "stat": set()}
+        for match in KEYWORD_RE.finditer(text_lower):
+            for kind, value in KEYWORD_HITS[match.group(0)]:
+                hits[kind].add(value)
+        return hits
+    
+    def _classify(self, hits: Dict[str, set]) -> Tuple[str, int]:
+        """Pick (category, priority) from keyword hits"""
+        # Earliest category in CATEGORY_KEYWORDS and highest priority win
+        category = min(hits["cat"], key=CATEGORY_RANK.get, default="other")
+        priority = min(hits["pri"], default=2)  # default medium
+        return category, priority
     
     def _extract_priority(self, text: str) -> int:
         """Auto-detect priority from text (1=high, 2=med, 3=low)"""
-        text_lower = text.lower()
-        
-        for priority, keywords in PRIORITY_KEYWORDS.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return priority
-        
-        return 2  # default medium
+        return self._classify(self._scan_keywords(text.lower()))[1]
     
     def _extract_category(self, text: str) -> str:
         """Auto-detect category from text"""
-        text_lower = text.lower()
-        
-        for category, keywords in CATEGORY_KEYWORDS.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return category
-                
-        return "other"  # default
+        return self._classify(self._scan_keywords(text.lower()))[0]
+    
+    def _extract_status(self, hits: Dict[str, set], precedence: Tuple[str, ...]) -> Optional[str]:
+        """Pick a status from keyword hits; first status in precedence wins"""
+        return next((status for status in precedence if status in hits["stat"]), None)
     
     def _parse_action(self, text: str) -> Optional[str]:
         """Extract action from natural language"""
-        text_lower = text.lower()
-        
-        for pattern, action in self.action_patterns.items():
-            if re.search(pattern, text_lower):
-                return action
-        
-        return None
+        match = self._action_re.search(text)
+        return match.lastgroup if match else None
     
     def _extract_ticket_id(self, text: str) -> Optional[str]:
         """Extract ticket ID from text (T001 format)"""
-        match = re.search(r'T\d{3}', text.upper())
-        return match.group(0) if match else None
+        match = self._id_re.search(text)
+        return match.group(0).upper() if match else None
     
     def process(self, user_input: str) -> Dict:
         """Main AI processing function - converts natural language to actions"""
         if not user_input:
             return ResponseTemplates.error_response("invalid")
         
-        action = self._parse_action(user_input)
+        # Normalise whitespace so repeated queries share a cache entry
+        command, args = self._parse(" ".join(user_input.split()))
+        return self._execute(command, args)
+    
+    def process_batch(self, texts: List[str]) -> List[Dict]:
+        """Process many inputs (e.g. a mail import) with one disk write"""
+        process = self.process
+        with self.manager.batch():
+            return [process(text) for text in texts]
+    
+    def _parse_input(self, text: str) -> Tuple[str, tuple]:
+        """Parse text into (command, args) - pure, cached per instance"""
+        action = self._parse_action(text)
+        if action is None:
+            return "error", ("invalid",)
+        if action == "close":
+            return self._parse_close(text)  # needs no keyword hits
+        
+        # One keyword scan shared by the remaining handlers
+        hits = self._scan_keywords(text.lower())
         
         if action == "create":
-            return self._handle_create(user_input)
+            return self._parse_create(text, hits)
         elif action == "update":
-            return self._handle_update(user_input)
-        elif action == "view":
-            return self._handle_view(user_input) 
-        elif action == "close":
-            return self._handle_close(user_input)
+            return self._parse_update(text, hits)
         else:
-            return ResponseTemplates.error_response("invalid")
+            return self._parse_view(text, hits)
     
-    def _handle_create(self, text: str) -> Dict:
-        """Handle ticket creation"""
+    def _execute(self, command: str, args: tuple) -> Dict:
+        """Run a parsed command against the ticket manager"""
+        if command == "create":
+            return self.manager.create_ticket(*args)
+        elif command == "update":
+            return self.manager.update_ticket(*args)
+        elif command == "get":
+            return self.manager.get_ticket(*args)
+        elif command == "list":
+            status, priority = args
+            return self.manager.list_tickets(TicketQuery(status=status, priority=priority))
+        elif command == "close":
+            return self.manager.close_ticket(*args)
+        else:
+            return ResponseTemplates.error_response(*args)
+    
+    def _parse_create(self, text: str, hits: Dict[str, set]) -> Tuple[str, tuple]:
+        """Parse ticket creation"""
         # Extract title (everything after action keywords)
-        title_match = re.search(r'(?:create|new|add)\s+(?:ticket\s+)?(.+)', text, re.IGNORECASE)
+        title_match = self._create_title_re.search(text)
         if not title_match:
-            return ResponseTemplates.error_response("missing_title")
+            return "error", ("missing_title",)
         
         title = title_match.group(1).strip()
         
         # Extract priority and category
-        priority = self._extract_priority(text)
-        category = self._extract_category(text)
+        category, priority = self._classify(hits)
         
-        return self.manager.create_ticket(title, "", category, priority)
+        return "create", (title, "", category, priority)
     
-    def _handle_update(self, text: str) -> Dict:
-        """Handle ticket updates"""
-        ticket_id = self._extract_ticket_id(text)
-        if not ticket_id:
-            return ResponseTemplates.error_response("invalid_id")
+    def _parse_update(self, text: str, hits: Dict[str, set]) -> Tuple[str, tuple]:
+        """Parse ticket updates"""
+        id_match = self._id_re.search(text)
+        if not id_match:
+            return "error", ("invalid_id",)
+        ticket_id = id_match.group(0).upper()
         
-        # Extract status
-        status = None
-        if any(word in text.lower() for word in ["progress", "prog", "working"]):
-            status = "prog"
-        elif any(word in text.lower() for word in ["done", "completed", "finished"]):
-            status = "done"
-        elif any(word in text.lower() for word in ["open", "new"]):
+        # Extract status (progress beats done beats open/new)
+        status = self._extract_status(hits, ("prog", "done", "open", "new"))
+        if status == "new":
             status = "open"
         
         # Extract resolution/note (everything after ticket ID)
-        note_match = re.search(rf'{ticket_id}\s+.*?\s+(.+)', text, re.IGNORECASE)
+        note_match = self._update_note_re.match(text, id_match.end())
         resolution = note_match.group(1).strip() if note_match else None
         
-        return self.manager.update_ticket(ticket_id, status, resolution)
+        return "update", (ticket_id, status, resolution)
     
-    def _handle_view(self, text: str) -> Dict:
-        """Handle ticket viewing"""
+    def _parse_view(self, text: str, hits: Dict[str, set]) -> Tuple[str, tuple]:
+        """Parse ticket viewing"""
         ticket_id = self._extract_ticket_id(text)
         
         if ticket_id:
             # Single ticket view
-            return self.manager.get_ticket(ticket_id)
+            return "get", (ticket_id,)
         else:
-            # List tickets with filters
-            query = TicketQuery()
+            # List tickets with filters; status: open beats progress beats done
+            status = self._extract_status(hits, ("open", "prog", "done"))
             
-            # Check for status filters
-            if "open" in text.lower():
-                query.status = "open"
-            elif "progress" in text.lower() or "prog" in text.lower():
-                query.status = "prog"
-            elif "done" in text.lower() or "closed" in text.lower():
-                query.status = "done"
+            # Check for priority filters: high beats low; medium means no filter,
+            # so a stray "med" (e.g. in "timed") must not cancel a low filter
+            pris = hits["pri"]
+            priority = 1 if 1 in pris else 3 if 3 in pris else None
             
-            # Check for priority filters
-            if any(word in text.lower() for word in PRIORITY_KEYWORDS[1]):
-                query.priority = 1
-            elif any(word in text.lower() for word in PRIORITY_KEYWORDS[3]):
-                query.priority = 3
-            
-            return self.manager.list_tickets(query)
+            return "list", (status, priority)
     
-    def _handle_close(self, text: str) -> Dict:
-        """Handle ticket closure"""
-        ticket_id = self._extract_ticket_id(text)
-        if not ticket_id:
-            return ResponseTemplates.error_response("invalid_id")
+    def _parse_close(self, text: str) -> Tuple[str, tuple]:
+        """Parse ticket closure"""
+        id_match = self._id_re.search(text)
+        if not id_match:
+            return "error", ("invalid_id",)
+        ticket_id = id_match.group(0).upper()
         
         # Extract resolution (everything after ticket ID and comma)
-        resolution_match = re.search(rf'{ticket_id}[,\s]+(.+)', text, re.IGNORECASE)
+        resolution_match = self._close_res_re.match(text, id_match.end())
         resolution = resolution_match.group(1).strip() if resolution_match else "resolved"
         
-        return self.manager.close_ticket(ticket_id, resolution)
+        return "close", (ticket_id, resolution)